@@ -0,0 +1,67 @@
+"""Micro-batching of concurrent requests to the same backend call.
+
+Callers each ``submit`` one item and await its result. Items that arrive
+close together are handed to a single ``handler`` call, trading a few
+milliseconds of latency for fewer, larger upstream requests.
+"""
+import asyncio
+
+
+class MicroBatcher:
+    """Gathers concurrent ``submit`` calls into batches for one ``handler`` call.
+
+    A batch is sent once it holds ``max_size`` items, or ``max_wait`` seconds
+    after its first item arrived, whichever comes first. ``handler`` gets the
+    list of items and returns their results in the same order; an exception
+    it raises is raised to every caller in the batch. Items whose caller has
+    given up before the batch is sent are left out of it.
+    """
+
+    def __init__(self, handler, max_size=8, max_wait=0.02):
+        self.handler = handler
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self._items = []
+        self._futures = []
+        self._timer = None
+        self._running = set()
+
+    async def submit(self, item):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._items.append(item)
+        self._futures.append(future)
+        if len(self._items) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch = [(item, future) for item, future in zip(self._items, self._futures) if not future.done()]
+        self._items = []
+        self._futures = []
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, batch):
+        try:
+            results = await self.handler([item for item, _ in batch])
+            if len(results) != len(batch):
+                raise ValueError(f"Batch handler returned {len(results)} results for {len(batch)} items")
+        except Exception as exc:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self):
+        return {"queued": len(self._items), "in_flight": len(self._running)}
@@ -0,0 +1,181 @@
+"""Microbenchmarks for the CPU hot paths of the chat pipeline.
+
+Each benchmark times one pure-Python operation in isolation and reports the
+best per-call time over several repeats. Results can be written as JSON and
+compared against an earlier run to catch per-request CPU regressions:
+
+    python bench.py --output bench_baseline.json
+    python bench.py --compare bench_baseline.json --max-regression 0.15
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import timeit
+
+# backend.py needs a key to build its client; no request is ever sent
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+import backend  # noqa: E402
+from risk_lexicon import OUTPUT_RISK_TERMS, RiskLexicon  # noqa: E402
+from safety_watchdog import is_safe_watchdog_response, parse_watchdog_verdict  # noqa: E402
+from session_store import ConversationContext, Session  # noqa: E402
+from streaming import STREAM_PROTOCOL_DELTA, STREAM_PROTOCOL_LEGACY, sse_event  # noqa: E402
+
+FREEFORM_VERDICTS = [
+    "ACCEPTABLE\n- The response is supportive and does not include harmful details.\n- It encourages reaching out to a professional.",
+    "- The user shows signs of distress.\n- The LLM missed opportunities to offer crisis resources.\n- Suggested improved response: acknowledge feelings and share a helpline.",
+    "- No significant risk detected.\n- The response is safe and on topic.",
+    "- The user may be at risk.\n- The response should have asked about their safety; recommend a revision that checks in.",
+    "- Safe overall, but could be better: feedback below.\n- Revision: add a gentle check-in.",
+] * 4
+STRUCTURED_VERDICTS = [
+    '{"verdict": "ACCEPTABLE", "risk": "none", "directives": []}',
+    '{"verdict": "REVISE", "risk": "high", "directives": ["Acknowledge distress", "Offer a crisis line", "Avoid method details"]}',
+    '{"verdict": "ACCEPTABLE", "risk": "low", "directives": []}',
+] * 4
+
+
+def make_history(turns):
+    history = []
+    for i in range(turns):
+        history.append({"role": "user", "content": f"This is user message number {i}, describing how my week went in some detail."})
+        history.append({"role": "assistant", "content": f"Thanks for sharing message {i}. It sounds like a lot happened; how are you feeling about it now?"})
+    return history
+
+
+def legacy_context(history):
+    # The original per-attempt rebuild with repeated string concatenation
+    conversation_context = ""
+    for msg in history:
+        conversation_context += f"User: {msg['content']}\n"
+    return conversation_context
+
+
+def incremental_session(history):
+    # Capped at its starting size so repeated timing runs stay at a steady state:
+    # each new message drops the oldest one, as in a long-running session
+    context = ConversationContext(max_turns=len(history), max_bytes=10 ** 9, max_tokens=10 ** 9)
+    for msg in history:
+        context.append(msg["role"], msg["content"])
+    return Session("bench", context)
+
+
+def benchmarks():
+    cases = {}
+
+    def verdicts_heuristic():
+        for text in FREEFORM_VERDICTS:
+            is_safe_watchdog_response(text)
+    cases["is_safe_watchdog_response/freeform_x20"] = verdicts_heuristic
+
+    def verdicts_structured():
+        for text in STRUCTURED_VERDICTS:
+            parse_watchdog_verdict(text, structured=True)
+    cases["parse_watchdog_verdict/structured_x12"] = verdicts_structured
+
+    for turns in (10, 100, 1000):
+        history = make_history(turns)
+        cases[f"conversation_context/legacy_rebuild/{turns}_turns"] = lambda h=history: legacy_context(h)
+        session = incremental_session(history)
+
+        def append_and_render(s=session):
+            # One new exchange on top of an existing context, then the watchdog input
+            # built from it, as on each request
+            s.context.append("user", "One more message from the user.")
+            s.context.append("assistant", "One more reply from the model.")
+            return backend.watchdog_messages(s, "One more reply from the model.")
+        cases[f"conversation_context/incremental_turn/{turns}_turns"] = append_and_render
+
+    lexicon = RiskLexicon()
+    benign_prompt = "Can you explain how photosynthesis works?"
+    benign_reply = "Photosynthesis is how plants turn light, water and carbon dioxide into sugar and oxygen. " * 8
+    cases["risk_lexicon/scan_benign_turn"] = lambda: lexicon.scan(benign_prompt, benign_reply)
+    cases["risk_lexicon/build"] = RiskLexicon
+    output_lexicon = RiskLexicon(OUTPUT_RISK_TERMS)
+    reply_chunks = [benign_reply[i:i + 40] for i in range(0, len(benign_reply), 40)]
+
+    def stream_scan():
+        scan = output_lexicon.stream()
+        for chunk in reply_chunks:
+            scan.feed(chunk)
+        return scan.close()
+    cases["risk_lexicon/stream_scan_reply"] = stream_scan
+
+    chunk = {"status": "o3_response_chunk", "chunk": " token", "attempt": 1}
+    accum = "word " * 400
+    legacy_chunk = dict(chunk, accum=accum)
+    cases["sse_frame/legacy_padded_with_accum"] = lambda: sse_event(legacy_chunk, STREAM_PROTOCOL_LEGACY)
+    cases["sse_frame/delta"] = lambda: sse_event(chunk, STREAM_PROTOCOL_DELTA)
+
+    responses = [f"Reply {i}: " + "some supportive text " * 20 for i in range(3)]
+    chat_response = backend.ChatResponse(
+        response=responses[-1],
+        attempts=3,
+        flagged=False,
+        chatgpt_response=responses[-1],
+        watchdog_response=FREEFORM_VERDICTS[0],
+        all_chatgpt_responses=responses,
+        all_watchdog_responses=FREEFORM_VERDICTS[:3],
+        session_id="0" * 32,
+    )
+    cases["ChatResponse/model_dump_json"] = chat_response.model_dump_json
+    return cases
+
+
+def measure(func, repeat, min_time):
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    number = max(1, int(number * min_time / 0.2))
+    best = min(timer.repeat(repeat=repeat, number=number))
+    return best / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--filter", default="", help="only run benchmarks whose name contains this")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per repeat")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.15, help="fail when slower by more than this fraction")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+
+    results = {}
+    regressions = []
+    for name, func in benchmarks().items():
+        if args.filter not in name:
+            continue
+        seconds = measure(func, args.repeat, args.min_time)
+        results[name] = {"ns_per_call": seconds * 1e9}
+        line = f"{name:<58}{seconds * 1e6:>12.2f} us"
+        if name in baseline:
+            change = seconds * 1e9 / baseline[name]["ns_per_call"] - 1
+            results[name]["change"] = change
+            line += f"  {change:+.1%}"
+            if change > args.max_regression:
+                regressions.append(name)
+                line += "  REGRESSION"
+        print(line)
+
+    if args.output:
+        report = {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "results": results,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) regressed by more than {args.max_regression:.0%}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
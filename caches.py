@@ -0,0 +1,248 @@
+import asyncio
+import hashlib
+import json
+import re
+import sqlite3
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from safety_watchdog import WatchdogVerdict
+
+
+def normalize_text(text):
+    return " ".join(text.split()).lower()
+
+
+def fingerprint(*parts):
+    """Stable hash of whitespace- and case-normalized text parts."""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(normalize_text(part).encode("utf-8"))
+        digest.update(b"\x1f")
+    return digest.hexdigest()
+
+
+class TTLCache:
+    """LRU cache whose entries also expire ``ttl_seconds`` after being stored."""
+
+    def __init__(self, max_entries=10000, ttl_seconds=86400):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            stored_at, value = entry
+            if time.time() - stored_at < self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key, value, stored_at=None):
+        self._entries[key] = (stored_at or time.time(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+class VerdictCache:
+    """Watchdog verdicts keyed by a fingerprint of the watchdog's input.
+
+    Lookups go to an in-memory ``TTLCache`` first and, when ``db_path`` is
+    set, to a SQLite table that keeps verdicts across restarts. SQLite calls
+    run in order on one worker thread, off the event loop: ``get`` awaits its
+    read, while ``put`` returns once the memory tier has the entry and leaves
+    the write queued.
+    """
+
+    def __init__(self, max_entries=10000, ttl_seconds=86400, db_path=None):
+        self.memory = TTLCache(max_entries, ttl_seconds)
+        self.ttl_seconds = ttl_seconds
+        self.disk_hits = 0
+        self._db = None
+        self._worker = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            # With WAL a crash can lose the last few writes but not corrupt the
+            # table, which is fine for a cache and spares an fsync per verdict
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="verdict-cache")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS watchdog_verdicts ("
+                "key TEXT PRIMARY KEY, stored_at REAL, response TEXT, verdict TEXT)"
+            )
+
+    @staticmethod
+    def key(model, messages):
+        return fingerprint(model, *(f"{m['role']}: {m['content']}" for m in messages))
+
+    async def get(self, key):
+        """Return ``(watchdog_response, verdict)`` or None."""
+        cached = self.memory.get(key)
+        if cached is not None or self._db is None:
+            return cached
+        row = await asyncio.get_running_loop().run_in_executor(self._worker, self._read, key)
+        if row is None or time.time() - row[0] >= self.ttl_seconds:
+            return None
+        cached = (row[1], WatchdogVerdict.from_dict(json.loads(row[2]), raw=row[1]))
+        self.memory.put(key, cached, stored_at=row[0])
+        self.disk_hits += 1
+        return cached
+
+    def put(self, key, watchdog_response, verdict):
+        stored_at = time.time()
+        self.memory.put(key, (watchdog_response, verdict), stored_at=stored_at)
+        if self._db is not None:
+            self._worker.submit(self._write, key, stored_at, watchdog_response, json.dumps(verdict.as_dict()))
+
+    def _read(self, key):
+        return self._db.execute(
+            "SELECT stored_at, response, verdict FROM watchdog_verdicts WHERE key = ?", (key,)
+        ).fetchone()
+
+    def _write(self, *row):
+        self._db.execute("INSERT OR REPLACE INTO watchdog_verdicts VALUES (?, ?, ?, ?)", row)
+
+    def stats(self):
+        stats = self.memory.stats()
+        # Memory misses that the SQLite tier answered are hits overall
+        stats["disk_hits"] = self.disk_hits
+        stats["misses"] -= self.disk_hits
+        lookups = stats["hits"] + self.disk_hits + stats["misses"]
+        stats["hit_rate"] = (stats["hits"] + self.disk_hits) / lookups if lookups else 0.0
+        return stats
+
+
+class ResponseCache(TTLCache):
+    """Approved replies to context-free (first-turn) prompts.
+
+    Values are ``(response, watchdog_response, verdict)`` tuples; only replies
+    the watchdog accepted are stored.
+    """
+
+    @staticmethod
+    def key(model, message):
+        return fingerprint(model, message)
+
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+
+
+def hashed_ngram_vector(text, dim=512, n=3):
+    """Unit-length bag of hashed character n-grams and words.
+
+    A cheap, local stand-in for a sentence embedding: paraphrases that share
+    most of their spelling ("I can't sleep", "cant sleep at all") land close
+    together under cosine similarity.
+    """
+    text = normalize_text(_PUNCTUATION.sub("", text))
+    padded = f" {text} "
+    features = [padded[i:i + n] for i in range(len(padded) - n + 1)]
+    features.extend(text.split())
+    vector = np.zeros(dim, dtype=np.float32)
+    if not features:
+        return vector
+    indices = [zlib.crc32(feature.encode("utf-8")) % dim for feature in features]
+    vector += np.bincount(indices, minlength=dim).astype(np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class SemanticCache:
+    """Approved first-turn replies looked up by prompt similarity.
+
+    Prompt vectors live in one preallocated matrix so a lookup is a single
+    matrix-vector product. Entries older than ``ttl_seconds`` are ignored and
+    their slots reused; when the cache is full the least recently used entry
+    is replaced.
+    """
+
+    def __init__(self, max_entries=2000, ttl_seconds=3600, threshold=0.92, dim=512):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self.dim = dim
+        self._vectors = np.zeros((max_entries, dim), dtype=np.float32)
+        self._stored_at = np.zeros(max_entries, dtype=np.float64)
+        self._last_used = np.zeros(max_entries, dtype=np.float64)
+        self._values = [None] * max_entries
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return self._size
+
+    def _search(self, vector, now):
+        if not self._size:
+            return -1, 0.0
+        scores = self._vectors[:self._size] @ vector
+        scores[now - self._stored_at[:self._size] >= self.ttl_seconds] = -1.0
+        best = int(np.argmax(scores))
+        return best, float(scores[best])
+
+    def get(self, message):
+        now = time.time()
+        slot, score = self._search(hashed_ngram_vector(message, self.dim), now)
+        if slot < 0 or score < self.threshold:
+            self.misses += 1
+            return None
+        self._last_used[slot] = now
+        self.hits += 1
+        return self._values[slot]
+
+    def put(self, message, value):
+        now = time.time()
+        vector = hashed_ngram_vector(message, self.dim)
+        slot, score = self._search(vector, now)
+        if slot < 0 or score < self.threshold:
+            if self._size < self.max_entries:
+                slot = self._size
+                self._size += 1
+            else:
+                # Expired entries were never used after their TTL, so they go first
+                expired = now - self._stored_at >= self.ttl_seconds
+                slot = int(np.argmax(expired)) if expired.any() else int(np.argmin(self._last_used))
+                self.evictions += 1
+        self._vectors[slot] = vector
+        self._stored_at[slot] = now
+        self._last_used[slot] = now
+        self._values[slot] = value
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": self._size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "threshold": self.threshold,
+        }
@@ -0,0 +1,185 @@
+"""Load generator for the /chat and /chat-stream endpoints.
+
+Drives the backend at a fixed concurrency and reports throughput, latency
+percentiles and, for /chat-stream, time to first token and per-stage timings:
+
+    python loadtest.py --endpoint chat-stream --concurrency 100 --requests 2000
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import sys
+import time
+import uuid
+
+import httpx
+
+PROMPTS = [
+    "I can't sleep at night, any tips?",
+    "What's a good way to deal with stress at work?",
+    "Can you explain how photosynthesis works?",
+    "I've been feeling really lonely lately.",
+    "Help me plan a weekly workout routine.",
+    "What is the capital of France?",
+    "How do I tell my friend I'm upset with them?",
+    "Write a short poem about the ocean.",
+]
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    # Nearest-rank percentile
+    ordered = sorted(values)
+    rank = math.ceil(pct / 100 * len(ordered))
+    return ordered[max(rank, 1) - 1]
+
+
+def summarize(values):
+    if not values:
+        return None
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values),
+    }
+
+
+class Results:
+    def __init__(self):
+        self.metrics = {}
+        self.errors = 0
+        self.flagged = 0
+        self.completed = 0
+
+    def record(self, name, value):
+        self.metrics.setdefault(name, []).append(value)
+
+
+def make_prompt(args):
+    prompt = random.choice(PROMPTS)
+    if args.unique:
+        # Defeat the response caches so every request reaches the models
+        prompt = f"{prompt} ({uuid.uuid4().hex[:8]})"
+    return prompt
+
+
+async def run_chat(client, args, results):
+    started = time.perf_counter()
+    response = await client.post(f"{args.url}/chat", json={"message": make_prompt(args)})
+    response.raise_for_status()
+    data = response.json()
+    results.record("total", time.perf_counter() - started)
+    results.record("attempts", data["attempts"])
+    results.flagged += data["flagged"]
+
+
+async def run_chat_stream(client, args, results):
+    started = time.perf_counter()
+    marks = {}
+    attempts = 0
+    body = {"message": make_prompt(args), "stream_protocol": args.stream_protocol}
+    async with client.stream("POST", f"{args.url}/chat-stream", json=body) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            event = json.loads(line[6:])
+            now = time.perf_counter() - started
+            status = event.get("status")
+            if status == "o3_response_chunk":
+                marks.setdefault("ttft", now)
+            elif status == "o3_response_done":
+                results.record("generation", now - marks.pop("o3_start", 0.0))
+            elif status == "o3_thinking":
+                marks["o3_start"] = now
+            elif status == "watchdog_assessing":
+                marks["watchdog_start"] = now
+            elif status == "watchdog_response_done":
+                results.record("watchdog", now - marks.pop("watchdog_start", now))
+                attempts += 1
+            elif status == "failed":
+                results.flagged += 1
+    results.record("total", time.perf_counter() - started)
+    results.record("attempts", attempts)
+    if "ttft" in marks:
+        results.record("ttft", marks["ttft"])
+
+
+async def worker(client, args, results, endpoints, remaining):
+    while remaining[0] > 0:
+        remaining[0] -= 1
+        endpoint = random.choice(endpoints)
+        try:
+            if endpoint == "chat":
+                await run_chat(client, args, results)
+            else:
+                await run_chat_stream(client, args, results)
+            results.completed += 1
+        except Exception as exc:
+            results.errors += 1
+            if args.verbose:
+                print(f"[loadtest] {endpoint} failed: {exc!r}", file=sys.stderr)
+
+
+async def run(args):
+    endpoints = ["chat", "chat-stream"] if args.endpoint == "both" else [args.endpoint]
+    results = Results()
+    remaining = [args.requests]
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client, args, results, endpoints, remaining) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+    return {
+        "endpoint": args.endpoint,
+        "concurrency": args.concurrency,
+        "requests": args.requests,
+        "completed": results.completed,
+        "errors": results.errors,
+        "flagged": results.flagged,
+        "elapsed_seconds": elapsed,
+        "throughput_rps": results.completed / elapsed if elapsed else 0.0,
+        "latency_seconds": {name: summarize(values) for name, values in results.metrics.items() if name != "attempts"},
+        "attempts": summarize(results.metrics.get("attempts", [])),
+    }
+
+
+def print_report(report):
+    print(f"{report['endpoint']}: {report['completed']}/{report['requests']} ok, {report['errors']} errors, "
+          f"{report['flagged']} flagged, {report['throughput_rps']:.1f} req/s over {report['elapsed_seconds']:.1f}s "
+          f"at concurrency {report['concurrency']}")
+    print(f"{'stage':<12}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+    for name, stats in report["latency_seconds"].items():
+        if stats:
+            print(f"{name:<12}" + "".join(f"{stats[k] * 1000:>8.0f}ms" for k in ("p50", "p95", "p99", "max")))
+    if report["attempts"]:
+        print(f"attempts per request: mean {report['attempts']['mean']:.2f}, max {report['attempts']['max']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--endpoint", choices=["chat", "chat-stream", "both"], default="both")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--stream-protocol", type=int, default=2)
+    parser.add_argument("--unique", action="store_true", help="make every prompt unique to bypass response caches")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+    report = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
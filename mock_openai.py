@@ -0,0 +1,215 @@
+"""Local stand-in for the OpenAI chat-completions API.
+
+Serves streaming and non-streaming /v1/chat/completions with a configurable
+time-to-first-token and token rate, and answers watchdog requests with
+scripted verdicts, so backend.py can be load tested offline:
+
+    python mock_openai.py --port 9000 --ttft-ms 300 --tokens-per-second 60
+    OPENAI_API_KEY=mock OPENAI_BASE_URL=http://localhost:9000/v1 uvicorn backend:app
+"""
+import argparse
+import asyncio
+import hashlib
+import itertools
+import json
+import random
+import time
+import uuid
+from collections import OrderedDict
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+WORDS = (
+    "thanks for reaching out. it sounds like you have a lot on your mind and I am "
+    "here to help with whatever you need. let us take this one step at a time."
+).split()
+
+UNSAFE_WORDS = "the lethal dose would be".split()
+
+app = FastAPI()
+config = argparse.Namespace(
+    ttft_ms=300.0,
+    tokens_per_second=60.0,
+    reply_tokens=120,
+    watchdog_model="gpt-4o",
+    flag_rate=0.0,
+    unsafe_rate=0.0,
+    prompt_cache_min_tokens=1024,
+    verdicts=None,
+    seed=None,
+)
+_verdicts = None
+_rng = random.Random()
+# Digests of message prefixes seen so far, least recently used first
+_prompt_prefixes = OrderedDict()
+PROMPT_CACHE_ENTRIES = 100000
+
+
+def is_watchdog_request(body):
+    messages = body.get("messages") or [{}]
+    system = messages[0].get("content", "") if messages[0].get("role") == "system" else ""
+    return body.get("model") == config.watchdog_model or "watchdog" in system.lower()
+
+
+def next_verdict():
+    if _verdicts is not None:
+        return next(_verdicts)
+    return "REVISE" if _rng.random() < config.flag_rate else "ACCEPTABLE"
+
+
+def watchdog_reply(body):
+    try:
+        items = json.loads((body.get("messages") or [{}])[-1].get("content", ""))
+    except ValueError:
+        items = None
+    items = len(items) if isinstance(items, list) else 0
+    if items:
+        # Batched request: one verdict per numbered item
+        verdicts = [dict(json.loads(single_verdict({"response_format": {"type": "json_object"}})), item=n) for n in range(1, items + 1)]
+        return json.dumps({"verdicts": verdicts})
+    return single_verdict(body)
+
+
+def single_verdict(body):
+    verdict = next_verdict()
+    if (body.get("response_format") or {}).get("type") == "json_object":
+        payload = {
+            "verdict": verdict,
+            "risk": "low" if verdict == "ACCEPTABLE" else "medium",
+            "directives": [] if verdict == "ACCEPTABLE" else ["Acknowledge the user's feelings and offer support resources."],
+            "confidence": 0.95 if verdict == "ACCEPTABLE" else 0.6,
+        }
+        return json.dumps(payload)
+    if verdict == "ACCEPTABLE":
+        return "ACCEPTABLE\n- The response is supportive and contains no harmful information."
+    return "REVISE\n- The response missed an opportunity to offer safety support.\n- Suggested improvement: acknowledge the user's feelings."
+
+
+def generator_reply():
+    words = list(itertools.islice(itertools.cycle(WORDS), config.reply_tokens))
+    if _rng.random() < config.unsafe_rate:
+        # Halfway through, so a streaming scan has something to cut short
+        words[len(words) // 2:len(words) // 2] = UNSAFE_WORDS
+    return " ".join(words)
+
+
+def count_tokens(text):
+    return max(1, len(text) // 4)
+
+
+def cached_prompt_tokens(messages):
+    # Like provider prompt caching: the longest run of leading messages sent
+    # before is cached, once it is at least --prompt-cache-min-tokens long
+    digest = hashlib.sha256()
+    tokens = cached = 0
+    for message in messages:
+        digest.update(json.dumps(message, sort_keys=True).encode())
+        tokens += count_tokens(message.get("content") or "")
+        key = digest.hexdigest()
+        if key in _prompt_prefixes:
+            _prompt_prefixes.move_to_end(key)
+            cached = tokens
+        else:
+            _prompt_prefixes[key] = None
+    while len(_prompt_prefixes) > PROMPT_CACHE_ENTRIES:
+        _prompt_prefixes.popitem(last=False)
+    return cached if cached >= config.prompt_cache_min_tokens else 0
+
+
+def usage_for(body, completion):
+    messages = body.get("messages", [])
+    prompt_tokens = sum(count_tokens(m.get("content") or "") for m in messages)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": count_tokens(completion),
+        "total_tokens": prompt_tokens + count_tokens(completion),
+        "prompt_tokens_details": {"cached_tokens": cached_prompt_tokens(messages)},
+    }
+
+
+def split_tokens(text):
+    # Roughly one token per word, keeping the separators
+    tokens = []
+    for i, word in enumerate(text.split(" ")):
+        tokens.append(word if i == 0 else " " + word)
+    return tokens
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    text = watchdog_reply(body) if is_watchdog_request(body) else generator_reply()
+    max_tokens = body.get("max_tokens")
+    tokens = split_tokens(text)
+    if max_tokens:
+        tokens = tokens[:max_tokens]
+        text = "".join(tokens)
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+    created = int(time.time())
+    delay = 1.0 / config.tokens_per_second if config.tokens_per_second > 0 else 0.0
+
+    if not body.get("stream"):
+        await asyncio.sleep(config.ttft_ms / 1000 + delay * len(tokens))
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": body.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": usage_for(body, text),
+        }
+
+    def frame(delta, finish_reason=None, usage=None):
+        chunk = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": body.get("model"),
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        if usage is not None:
+            chunk["choices"] = []
+            chunk["usage"] = usage
+        return f"data: {json.dumps(chunk)}\n\n"
+
+    async def stream():
+        await asyncio.sleep(config.ttft_ms / 1000)
+        yield frame({"role": "assistant", "content": ""})
+        for token in tokens:
+            yield frame({"content": token})
+            if delay:
+                await asyncio.sleep(delay)
+        yield frame({}, finish_reason="stop")
+        if (body.get("stream_options") or {}).get("include_usage"):
+            yield frame({}, usage=usage_for(body, text))
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+
+def main():
+    global _verdicts
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--ttft-ms", type=float, default=config.ttft_ms, help="delay before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=config.tokens_per_second, help="0 streams without delay")
+    parser.add_argument("--reply-tokens", type=int, default=config.reply_tokens, help="length of generator replies")
+    parser.add_argument("--watchdog-model", default=config.watchdog_model)
+    parser.add_argument("--flag-rate", type=float, default=config.flag_rate, help="probability that the watchdog answers REVISE")
+    parser.add_argument("--unsafe-rate", type=float, default=config.unsafe_rate, help="probability that a generator reply contains unsafe text")
+    parser.add_argument("--prompt-cache-min-tokens", type=int, default=config.prompt_cache_min_tokens, help="shortest cached prompt prefix reported in usage")
+    parser.add_argument("--verdicts", help="comma-separated verdict script, e.g. REVISE,ACCEPTABLE (overrides --flag-rate)")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+    vars(config).update({k: v for k, v in vars(args).items() if k in vars(config)})
+    if config.verdicts:
+        _verdicts = itertools.cycle(v.strip().upper() for v in config.verdicts.split(","))
+    _rng.seed(config.seed)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""Local lexical risk scan run before the LLM watchdog.
+
+All lexicon terms are compiled into one Aho-Corasick automaton, so a message
+is scanned in a single pass whatever the size of the lexicon. Text is
+lowercased, apostrophes are dropped ("can't" reads as "cant") and the rest is
+split into ASCII words (anything else separates words), and
+terms match on word boundaries: "kill myself" matches, "skill" does not. A
+term ending in ``*`` only needs the boundary before it, so "suicid*" covers
+"suicidal".
+
+Most text matches nothing, so a scan first checks for each term's anchor
+(its longest word, or its stem) with a set lookup and one regex search and skips
+the automaton when none is present. Otherwise words that appear in no term
+are dropped before the automaton runs, leaving a break so terms cannot match
+across them, which keeps the per-character loop to the few words that could
+be part of a match.
+
+``RiskLexicon.stream`` scans text that arrives in pieces, such as a streamed
+reply. The automaton state is carried from one piece to the next, so a term
+split across two pieces still matches.
+"""
+import re
+import string
+from collections import deque
+from dataclasses import dataclass
+
+# (term, weight). Weight 1.0 marks an explicit crisis signal; lower weights
+# mark words that are usually benign but worth a closer look in context.
+RISK_TERMS = (
+    # Self-harm and suicide
+    ("suicid*", 1.0), ("kill myself", 1.0), ("killing myself", 1.0), ("end my life", 1.0),
+    ("end it all", 1.0), ("take my own life", 1.0), ("want to die", 1.0), ("wanna die", 1.0),
+    ("better off dead", 1.0), ("no reason to live", 1.0), ("don't want to live", 1.0),
+    ("don't want to be here", 0.8), ("can't go on", 0.8), ("self harm", 1.0),
+    ("selfharm", 1.0), ("cut myself", 1.0), ("cutting myself", 1.0), ("hurt myself", 1.0),
+    ("hurting myself", 1.0), ("overdose*", 1.0), ("od on", 0.8), ("hang myself", 1.0),
+    ("jump off", 0.6), ("slit", 0.8), ("noose", 1.0), ("lethal dose", 1.0), ("final goodbye", 0.8),
+    ("goodbye letter", 0.8), ("suicide note", 1.0), ("kill me", 0.8), ("ending my life", 1.0),
+    ("take my life", 1.0), ("kms", 1.0), ("unaliv*", 1.0), ("end it", 0.6), ("ending it", 0.6),
+    ("not worth living", 1.0), ("don't want to wake up", 1.0), ("want to disappear", 0.6),
+    # Emotional distress
+    ("hopeless*", 0.5), ("worthless", 0.5), ("helpless*", 0.4), ("empty inside", 0.5),
+    ("depressed", 0.4), ("depression", 0.4), ("panic attack*", 0.4), ("can't cope", 0.5), ("can't take it", 0.8),
+    ("breaking down", 0.4), ("burden to", 0.6), ("no one cares", 0.5), ("nobody cares", 0.5),
+    ("all alone", 0.4), ("trapped", 0.4), ("give up on life", 0.8), ("starve myself", 1.0),
+    ("starving myself", 1.0), ("purging", 0.6), ("binge", 0.3),
+    # Violence and abuse
+    ("kill him", 1.0), ("kill her", 1.0), ("kill them", 1.0), ("kill someone", 1.0),
+    ("hurt someone", 0.8), ("shoot", 0.6), ("stab*", 0.8), ("murder*", 0.8), ("weapon*", 0.5),
+    ("gun", 0.5), ("guns", 0.5), ("knife", 0.4), ("bomb*", 0.6), ("explosive*", 0.6), ("poison*", 0.8),
+    ("abuse*", 0.6), ("abusive", 0.6), ("hits me", 0.8), ("beats me", 0.8), ("assault*", 0.8),
+    ("raped", 1.0), ("rape", 1.0), ("molest*", 1.0), ("threaten*", 0.5), ("revenge", 0.4),
+    # Substances and dangerous instructions
+    ("pills", 0.5), ("sleeping pills", 0.8), ("painkillers", 0.5), ("opioid*", 0.5),
+    ("fentanyl", 0.8), ("bleach", 0.5), ("drunk", 0.3), ("high on", 0.4), ("how much", 0.2),
+    ("how many", 0.2), ("mg", 0.3), ("tylenol", 0.5), ("acetaminophen", 0.5), ("paracetamol", 0.5),
+    ("ibuprofen", 0.3),
+)
+
+# Terms a generated reply should never contain, whoever is speaking: method
+# details and encouragement. Scanned as the reply streams in.
+OUTPUT_RISK_TERMS = (
+    ("lethal dose", 1.0), ("fatal dose", 1.0), ("lethal amount", 1.0), ("tie a noose", 1.0),
+    ("hang yourself", 1.0), ("slit your wrist*", 1.0), ("cut your wrist*", 1.0), ("cut deeper", 1.0),
+    ("painless way to die", 1.0), ("quickest way to die", 1.0), ("kill yourself", 0.6),
+    ("overdose on", 0.6), ("pills at once", 0.6), ("mg per kg", 0.5), ("mix bleach", 1.0),
+    ("bleach and ammonia", 1.0), ("pipe bomb", 1.0), ("make a bomb", 1.0), ("build a bomb", 1.0),
+    ("untraceable poison", 1.0), ("without getting caught", 0.6), ("hide the bruises", 0.6),
+    ("you should end it", 1.0), ("no one would miss you", 1.0), ("better off without you", 1.0),
+)
+
+
+@dataclass
+class RiskScan:
+    score: float
+    terms: tuple
+
+
+_WORD_BYTES = frozenset((string.ascii_lowercase + string.digits + "_").encode())
+_SEPARATE = bytes(c if c in _WORD_BYTES else 0x20 for c in range(256))
+# Dropped rather than separating words, so "can't" and "cant" both read "cant"
+_APOSTROPHES = b"'"
+_BREAK = b"|"
+
+
+def _normalize(text):
+    return text.lower().replace("’", "'").encode("ascii", "replace").translate(_SEPARATE, _APOSTROPHES)
+
+
+def split_words(text):
+    """Lowercase ASCII words of ``text`` as bytes; other characters separate words."""
+    return _normalize(text).split()
+
+
+class RiskLexicon:
+    """Multi-pattern matcher over a weighted term list."""
+
+    def __init__(self, terms=RISK_TERMS):
+        patterns = []
+        words = set()
+        stems = set()
+        anchors = set()
+        for term, weight in terms:
+            prefix = term.endswith("*")
+            term = term.rstrip("*")
+            term_words = split_words(term)
+            patterns.append((b" " + b" ".join(term_words) + (b"" if prefix else b" "), term, weight))
+            if prefix:
+                stems.add(term_words.pop())
+            else:
+                anchors.add(max(term_words, key=len))
+            words.update(term_words)
+        self._words = frozenset(words)
+        self._stems = tuple(sorted(stems))
+        self._anchors = frozenset(anchors)
+        self._stem_anchor = re.compile(b" (?:" + b"|".join(map(re.escape, self._stems)) + b")")
+        self._build(patterns)
+
+    def _build(self, patterns):
+        goto = [{}]
+        outputs = [()]
+        for pattern, term, weight in patterns:
+            state = 0
+            for ch in pattern:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    outputs.append(())
+                state = nxt
+            outputs[state] += ((term, weight),)
+
+        # Breadth-first failure links, folded into a complete transition table
+        # over the lexicon's alphabet; any other character returns to the root
+        alphabet = set().union(*(g.keys() for g in goto))
+        fail = [0] * len(goto)
+        delta = [dict() for _ in goto]
+        queue = deque()
+        for ch in alphabet:
+            nxt = goto[0].get(ch, 0)
+            delta[0][ch] = nxt
+            if nxt:
+                queue.append(nxt)
+        while queue:
+            state = queue.popleft()
+            outputs[state] += outputs[fail[state]]
+            for ch in alphabet:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    delta[state][ch] = delta[fail[state]][ch]
+                else:
+                    fail[nxt] = delta[fail[state]][ch]
+                    delta[state][ch] = nxt
+                    queue.append(nxt)
+        self._delta = delta
+        self._outputs = outputs
+
+    def scan(self, *texts):
+        """Score ``texts`` together; each matched term counts once."""
+        found = {}
+        delta = self._delta
+        outputs = self._outputs
+        words = self._words
+        stems = self._stems
+        for text in texts:
+            tokens = split_words(text)
+            if self._anchors.isdisjoint(tokens):
+                if not self._stem_anchor.search(b" " + b" ".join(tokens)):
+                    continue
+            kept = []
+            for word in tokens:
+                if word in words or word.startswith(stems):
+                    kept.append(word)
+                elif kept and kept[-1] is not _BREAK:
+                    # Not in the alphabet, so the automaton restarts after it
+                    kept.append(_BREAK)
+            state = 0
+            for ch in b" " + b" ".join(kept) + b" ":
+                state = delta[state].get(ch, 0)
+                if outputs[state]:
+                    found.update(outputs[state])
+        return RiskScan(score=sum(found.values()), terms=tuple(found))
+
+    def stream(self):
+        return StreamScan(self)
+
+
+class StreamScan:
+    """Incremental scan of one text fed in pieces; each matched term counts once."""
+
+    def __init__(self, lexicon):
+        self._delta = lexicon._delta
+        self._outputs = lexicon._outputs
+        self._found = {}
+        self.score = 0.0
+        # The text starts on a word boundary
+        self._state = self._delta[0].get(0x20, 0)
+
+    def feed(self, text):
+        """Scan the next piece of text and return the score so far."""
+        delta = self._delta
+        outputs = self._outputs
+        state = self._state
+        for ch in _normalize(text):
+            state = delta[state].get(ch, 0)
+            if outputs[state]:
+                self._found.update(outputs[state])
+        self._state = state
+        self.score = sum(self._found.values())
+        return self.score
+
+    def close(self):
+        """End the text, completing a term that ends it; returns the final score."""
+        return self.feed(" ")
+
+    def result(self):
+        return RiskScan(score=self.score, terms=tuple(self._found))
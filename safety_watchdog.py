@@ -0,0 +1,252 @@
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Optional
+
+RISK_LEVELS = ("none", "low", "medium", "high")
+VERDICT_ACCEPTABLE = "ACCEPTABLE"
+VERDICT_REVISE = "REVISE"
+
+
+@dataclass
+class WatchdogVerdict:
+    safe: bool
+    risk: str = "unknown"
+    directives: list = field(default_factory=list)
+    structured: bool = False
+    raw: str = ""
+    # Only reported by the screening tier
+    confidence: Optional[float] = None
+
+    @property
+    def feedback(self):
+        """Text handed back to the generator when a revision is needed."""
+        if not self.structured:
+            return self.raw.strip()
+        lines = [f"Risk level: {self.risk}"]
+        lines.extend(f"- {directive}" for directive in self.directives)
+        return "\n".join(lines)
+
+    def as_dict(self):
+        return {
+            "verdict": VERDICT_ACCEPTABLE if self.safe else VERDICT_REVISE,
+            "risk": self.risk,
+            "directives": self.directives,
+            "structured": self.structured,
+            "confidence": self.confidence,
+        }
+
+    @classmethod
+    def from_dict(cls, data, raw=""):
+        return cls(
+            safe=data["verdict"] == VERDICT_ACCEPTABLE,
+            risk=data.get("risk", "unknown"),
+            directives=list(data.get("directives", [])),
+            structured=data.get("structured", False),
+            raw=raw,
+            confidence=data.get("confidence"),
+        )
+
+
+def is_safe_watchdog_response(watchdog_result: str) -> bool:
+    text = watchdog_result.strip().lower()
+    # If 'acceptable' is present, always treat as safe
+    if 'acceptable' in text:
+        return True
+    acceptance_phrases = [
+        'safe', 'good enough', 'no major issues', 'no significant risk'
+    ]
+    improvement_indicators = [
+        'improved response', 'suggested', 'missed opportunities',
+        'could be better', 'should have', 'recommend', 'feedback',
+        'revision', 'better response', 'improvement'
+    ]
+    for phrase in acceptance_phrases:
+        if phrase in text:
+            if not any(indicator in text for indicator in improvement_indicators):
+                return True
+    return False
+
+
+def parse_structured_verdict(text):
+    """Parse a JSON verdict payload, or return None if ``text`` is not one."""
+    start = text.find("{")
+    end = text.rfind("}")
+    if start < 0 or end < start:
+        return None
+    try:
+        data = json.loads(text[start:end + 1])
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    return _verdict_from_data(data, text)
+
+
+def parse_batch_verdicts(text, count):
+    """``{item number: verdict}`` from a batched watchdog reply about ``count`` items.
+
+    The reply holds ``{"verdicts": [{"item": n, "verdict": ...}, ...]}``; items
+    that are missing or unusable are left out, as are numbers outside
+    ``1..count``. When entries for one item disagree, the REVISE wins.
+    """
+    start = text.find("{")
+    end = text.rfind("}")
+    try:
+        data = json.loads(text[start:end + 1]) if 0 <= start < end else None
+    except ValueError:
+        return {}
+    entries = data.get("verdicts") if isinstance(data, dict) else None
+    if not isinstance(entries, list):
+        return {}
+    verdicts = {}
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        try:
+            item = int(entry.get("item"))
+        except (TypeError, ValueError):
+            continue
+        if not 1 <= item <= count:
+            continue
+        verdict = _verdict_from_data(entry, json.dumps(entry))
+        if verdict is not None and (item not in verdicts or verdicts[item].safe):
+            verdicts[item] = verdict
+    return verdicts
+
+
+def _verdict_from_data(data, text):
+    verdict = str(data.get("verdict", "")).strip().upper()
+    if verdict not in (VERDICT_ACCEPTABLE, VERDICT_REVISE):
+        return None
+    risk = str(data.get("risk", "")).strip().lower()
+    if risk not in RISK_LEVELS:
+        risk = "unknown"
+    directives = data.get("directives") or []
+    if isinstance(directives, str):
+        directives = [directives]
+    directives = [str(d).strip() for d in directives if str(d).strip()]
+    try:
+        confidence = min(max(float(data["confidence"]), 0.0), 1.0)
+    except (KeyError, TypeError, ValueError):
+        confidence = None
+    return WatchdogVerdict(
+        safe=verdict == VERDICT_ACCEPTABLE,
+        risk=risk,
+        directives=directives,
+        structured=True,
+        raw=text,
+        confidence=confidence,
+    )
+
+
+def parse_watchdog_verdict(text, structured=False):
+    """Structured verdict if the watchdog returned one, else a fallback.
+
+    Free-form replies fall back to the phrase heuristic. A reply that was
+    asked for as JSON but does not parse, e.g. one cut off by the token
+    limit, is judged by its verdict key alone, and as REVISE without one.
+    """
+    verdict = parse_structured_verdict(text)
+    if verdict is not None:
+        return verdict
+    if structured:
+        match = _STRUCTURED_VERDICT.search(text)
+        safe = match is not None and match.group(1).upper() == VERDICT_ACCEPTABLE
+        return WatchdogVerdict(safe=safe, structured=True, raw=text)
+    return WatchdogVerdict(safe=is_safe_watchdog_response(text), raw=text)
+
+
+def escalation_reason(verdict, max_risk="low", min_confidence=0.8):
+    """Why a screening verdict must go to the full watchdog, or None if it can stand.
+
+    Only a confident, well-formed ACCEPTABLE at or below ``max_risk`` stands.
+    """
+    if verdict is None or not verdict.structured:
+        return "unparsed"
+    if not verdict.safe:
+        return "revise"
+    if verdict.risk not in RISK_LEVELS or RISK_LEVELS.index(verdict.risk) > RISK_LEVELS.index(max_risk):
+        return "risk"
+    if verdict.confidence is None or verdict.confidence < min_confidence:
+        return "confidence"
+    return None
+
+
+AGGREGATION_POLICIES = ("any", "majority", "all")
+
+
+def flags_needed(policy, count):
+    """How many of ``count`` checks must ask for a revision under ``policy``."""
+    if policy == "all":
+        return count
+    if policy == "majority":
+        return count // 2 + 1
+    if policy == "any":
+        return 1
+    raise ValueError(f"Unknown aggregation policy {policy!r}; expected one of {AGGREGATION_POLICIES}")
+
+
+def merge_verdicts(verdicts, needed=1):
+    """One verdict from several narrow checks, given as ``{name: verdict}``.
+
+    The merged verdict is REVISE once ``needed`` checks ask for a revision; a
+    check without a usable verdict (None) counts as one that does. The risk
+    is the highest any check reported, and a REVISE carries the directives
+    of the checks that flagged the response.
+    """
+    flagged = [name for name, verdict in verdicts.items() if verdict is None or not verdict.safe]
+    safe = len(flagged) < needed
+    risks = [verdict.risk for verdict in verdicts.values() if verdict is not None and verdict.risk in RISK_LEVELS]
+    risk = max(risks, key=RISK_LEVELS.index) if risks else "unknown"
+    directives = [] if safe else [d for name in flagged if verdicts[name] is not None for d in verdicts[name].directives]
+    raw = json.dumps({
+        "verdict": VERDICT_ACCEPTABLE if safe else VERDICT_REVISE,
+        "risk": risk,
+        "directives": directives,
+        "checks": {name: verdict.as_dict()["verdict"] if verdict is not None else None for name, verdict in verdicts.items()},
+    })
+    return WatchdogVerdict(safe=safe, risk=risk, directives=directives, structured=True, raw=raw)
+
+
+_STRUCTURED_VERDICT = re.compile(r'"verdict"\s*:\s*"(ACCEPTABLE|REVISE)"', re.IGNORECASE)
+_LEADING_VERDICT = re.compile(r'^[\s*#>`"\'_-]*(ACCEPTABLE|REVISE)\b', re.IGNORECASE)
+
+
+class VerdictDetector:
+    """Spots the watchdog's verdict in the first characters of its reply.
+
+    The watchdog is prompted to lead with its verdict, either as the first
+    JSON key or as the first word. Once ``scan_limit`` characters have
+    arrived without one, the detector gives up and the full reply is parsed;
+    ``structured`` says whether it was asked for as JSON.
+    """
+
+    def __init__(self, scan_limit=160, structured=False):
+        self.scan_limit = scan_limit
+        self.structured = structured
+        self.verdict = None
+        self._head = ""
+
+    def feed(self, chunk):
+        """Add a chunk and return the verdict once it is known, else None."""
+        if self.verdict is not None or len(self._head) >= self.scan_limit:
+            return self.verdict
+        self._head += chunk
+        match = _STRUCTURED_VERDICT.search(self._head) or _LEADING_VERDICT.match(self._head)
+        if match:
+            self.verdict = match.group(1).upper()
+        return self.verdict
+
+    @property
+    def settled_safe(self):
+        return self.verdict == VERDICT_ACCEPTABLE
+
+    def result(self, text):
+        """Final verdict for ``text``, which may stop right after an early ACCEPTABLE."""
+        verdict = parse_structured_verdict(text)
+        if verdict is None and self.verdict is not None:
+            # The leading verdict decides; the reply may have been cut short before
+            # it formed complete JSON, and the phrase heuristic must not overrule it
+            verdict = WatchdogVerdict(safe=self.settled_safe, structured=text.lstrip().startswith("{"), raw=text)
+        return verdict or parse_watchdog_verdict(text, self.structured)
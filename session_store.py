@@ -0,0 +1,185 @@
+import time
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+
+
+def new_session_id():
+    return uuid.uuid4().hex
+
+
+def estimate_tokens(text):
+    # Roughly 4 characters per token for English with OpenAI's BPE tokenizers;
+    # close enough for budgeting without shipping a tokenizer
+    return len(text) // 4 + 1
+
+
+class ConversationContext:
+    """Conversation history of one session, kept pre-rendered for the watchdog.
+
+    Messages are rendered to transcript lines once, when they are appended.
+    The oldest messages are dropped while the context holds more than
+    ``max_turns`` messages, ``max_bytes`` of content or ``max_tokens``
+    estimated tokens; the most recent message is always kept.
+    """
+
+    def __init__(self, max_turns=50, max_bytes=64 * 1024, max_tokens=6000):
+        self.max_turns = max_turns
+        self.max_bytes = max_bytes
+        self.max_tokens = max_tokens
+        self.messages = deque()
+        self._lines = deque()
+        self._sizes = deque()
+        self.nbytes = 0
+        self.tokens = 0
+        self.omitted = 0
+
+    def __len__(self):
+        return len(self.messages)
+
+    def append(self, role, content):
+        """Add a message and return the change in stored bytes."""
+        speaker = "User" if role == "user" else "LLM"
+        line = f"{speaker}: {content}\n"
+        nbytes = len(content.encode("utf-8"))
+        tokens = estimate_tokens(line)
+        self.messages.append({"role": role, "content": content})
+        self._lines.append({"role": "user", "content": line})
+        self._sizes.append((nbytes, tokens))
+        self.nbytes += nbytes
+        self.tokens += tokens
+        return nbytes - self._trim()
+
+    def transcript_messages(self):
+        """The transcript as one user message per line, each built when it was appended.
+
+        The message dicts are shared between calls and must not be modified.
+        """
+        messages = list(self._lines)
+        if self.omitted:
+            messages.insert(0, {"role": "user", "content": f"[{self.omitted} earlier messages omitted]\n"})
+        return messages
+
+    def prior_messages(self):
+        """Chat messages for everything before the most recent message."""
+        messages = list(self.messages)
+        return messages[:-1]
+
+    def _trim(self):
+        freed = 0
+        while len(self.messages) > 1 and (
+            len(self.messages) > self.max_turns
+            or self.nbytes > self.max_bytes
+            or self.tokens > self.max_tokens
+        ):
+            self.messages.popleft()
+            self._lines.popleft()
+            nbytes, tokens = self._sizes.popleft()
+            self.nbytes -= nbytes
+            self.tokens -= tokens
+            self.omitted += 1
+            freed += nbytes
+        return freed
+
+
+@dataclass
+class Session:
+    session_id: str
+    context: ConversationContext
+    last_access: float = 0.0
+    # Flags and risky verdicts so far; sessions with any skip the lexical pre-screen
+    risk_signals: int = 0
+
+    @property
+    def nbytes(self):
+        return self.context.nbytes
+
+
+class ConversationStore:
+    """In-memory conversation history keyed by session id.
+
+    Each session's ``ConversationContext`` is capped at ``max_turns`` messages,
+    ``max_session_bytes`` of content and ``max_tokens`` estimated tokens.
+    Sessions idle for longer than ``ttl_seconds`` expire, and when the total
+    across all sessions exceeds ``max_total_bytes`` the least recently used
+    sessions are evicted.
+    """
+
+    def __init__(self, max_turns=50, max_session_bytes=64 * 1024,
+                 ttl_seconds=1800, max_total_bytes=256 * 1024 * 1024,
+                 max_tokens=6000):
+        self.max_turns = max_turns
+        self.max_session_bytes = max_session_bytes
+        self.max_tokens = max_tokens
+        self.ttl_seconds = ttl_seconds
+        self.max_total_bytes = max_total_bytes
+        # Ordered least to most recently used
+        self._sessions = OrderedDict()
+        self._total_bytes = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def get(self, session_id):
+        """Return the session for ``session_id``, creating it if needed."""
+        now = time.monotonic()
+        self._expire(now)
+        session = self._sessions.get(session_id)
+        if session is None:
+            context = ConversationContext(self.max_turns, self.max_session_bytes, self.max_tokens)
+            session = Session(session_id=session_id, context=context)
+            self._sessions[session_id] = session
+        else:
+            self._sessions.move_to_end(session_id)
+        session.last_access = now
+        return session
+
+    def append(self, session, role, content):
+        """Add a message to ``session`` and enforce the memory limits.
+
+        A session that expired or was evicted while its turn was running still
+        gets the message, but is no longer counted against the store.
+        """
+        added = session.context.append(role, content)
+        if self._sessions.get(session.session_id) is not session:
+            return
+        self._total_bytes += added
+        session.last_access = time.monotonic()
+        self._sessions.move_to_end(session.session_id)
+        self._evict(keep=session.session_id)
+
+    def drop(self, session_id):
+        session = self._sessions.pop(session_id, None)
+        if session is not None:
+            self._total_bytes -= session.nbytes
+
+    def stats(self):
+        sessions = len(self._sessions)
+        return {
+            "sessions": sessions,
+            "messages": sum(len(s.context) for s in self._sessions.values()),
+            "context_tokens": sum(s.context.tokens for s in self._sessions.values()),
+            "total_bytes": self._total_bytes,
+            "max_total_bytes": self.max_total_bytes,
+            "avg_session_bytes": self._total_bytes // sessions if sessions else 0,
+            "expired": self.expired,
+            "evicted": self.evicted,
+        }
+
+    def _expire(self, now):
+        # LRU order is also last-access order, so expired sessions sit at the front
+        deadline = now - self.ttl_seconds
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if session.last_access > deadline:
+                break
+            self.drop(session.session_id)
+            self.expired += 1
+
+    def _evict(self, keep):
+        while self._total_bytes > self.max_total_bytes and len(self._sessions) > 1:
+            session_id = next(iter(self._sessions))
+            if session_id == keep:
+                self._sessions.move_to_end(keep)
+                continue
+            self.drop(session_id)
+            self.evicted += 1
@@ -0,0 +1,295 @@
+import asyncio
+import json
+import re
+import zlib
+from collections import deque
+
+# Version 1 sends the full accumulated text with every chunk event and pads
+# each frame; version 2 sends deltas only and closes each message with its
+# length and checksum so the client can verify what it reassembled.
+STREAM_PROTOCOL_LEGACY = 1
+STREAM_PROTOCOL_DELTA = 2
+STREAM_PROTOCOLS = (STREAM_PROTOCOL_LEGACY, STREAM_PROTOCOL_DELTA)
+
+LEGACY_PADDING = " " * 1024
+
+# Where GatedRelease may cut streamed text into segments
+SEGMENT_BOUNDARIES = {
+    "sentence": re.compile(r"[.!?\u2026]+[\"'\u201d\u2019)\]]*\s+"),
+    "paragraph": re.compile(r"\n\s*\n"),
+}
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    # Stop nginx-style proxies from buffering the stream now that frames are unpadded
+    "X-Accel-Buffering": "no",
+}
+
+
+def sse_event(payload, protocol=STREAM_PROTOCOL_DELTA):
+    if protocol == STREAM_PROTOCOL_LEGACY:
+        return f"data: {json.dumps(payload)}{LEGACY_PADDING}\n\n:\n"
+    return f"data: {json.dumps(payload, separators=(',', ':'))}\n\n"
+
+
+def text_digest(text):
+    """Length and checksum of a streamed message, as checked by the client.
+
+    The length is counted in UTF-16 code units to match JavaScript's
+    ``String.length``; the checksum is the CRC-32 of the UTF-8 bytes.
+    """
+    return {
+        "length": len(text.encode("utf-16-le")) // 2,
+        "crc32": zlib.crc32(text.encode("utf-8")) & 0xFFFFFFFF,
+    }
+
+
+class _Failure:
+    def __init__(self, exc):
+        self.exc = exc
+
+
+_END = object()
+
+
+async def coalesce_chunks(chunks, window=0.03, max_chars=256):
+    """Merge the deltas of an async text stream into fewer, larger ones.
+
+    Buffered text is flushed ``window`` seconds after the first delta in the
+    buffer arrived, as soon as it reaches ``max_chars``, and always when the
+    upstream stream ends, so callers can emit a status event right after the
+    last delta without anything left behind. A ``window`` of 0 disables
+    coalescing. Closing the merged stream early also closes ``chunks``.
+    """
+    if window <= 0:
+        try:
+            async for chunk in chunks:
+                yield chunk
+        finally:
+            await chunks.aclose()
+        return
+
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+
+    async def pump():
+        try:
+            async for chunk in chunks:
+                queue.put_nowait(chunk)
+        except Exception as exc:
+            queue.put_nowait(_Failure(exc))
+        queue.put_nowait(_END)
+
+    # Reading upstream from a separate task lets a stalled stream still flush on time
+    reader = asyncio.ensure_future(pump())
+    buffer = []
+    size = 0
+    deadline = None
+    try:
+        while True:
+            if buffer and (size >= max_chars or loop.time() >= deadline):
+                yield "".join(buffer)
+                buffer = []
+                size = 0
+                deadline = None
+            if not queue.empty():
+                item = queue.get_nowait()
+            else:
+                timeout = deadline - loop.time() if buffer else None
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    continue
+            if item is _END:
+                break
+            if isinstance(item, _Failure):
+                raise item.exc
+            if not buffer:
+                deadline = loop.time() + window
+            buffer.append(item)
+            size += len(item)
+        if buffer:
+            yield "".join(buffer)
+    finally:
+        if not reader.done():
+            # Cancelling the reader also closes the upstream stream it is iterating
+            reader.cancel()
+
+
+async def _until_disconnected(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def cancel_on_disconnect(frames, receive, on_disconnect=None):
+    """Relay ``frames`` until the ASGI client disconnects, then cancel them.
+
+    ``frames`` is driven from its own task, so a disconnect interrupts whatever
+    it is awaiting (an upstream stream, a watchdog call) rather than being
+    noticed at the next frame, if ever. ``on_disconnect`` is called once when
+    the stream is abandoned before ``frames`` is exhausted, including when the
+    server itself cancels the response.
+    """
+    # One frame of read-ahead: the pipeline never runs far ahead of the socket
+    queue = asyncio.Queue(maxsize=1)
+
+    async def pump():
+        try:
+            async for frame in frames:
+                await queue.put(frame)
+        except Exception as exc:
+            await queue.put(_Failure(exc))
+            return
+        await queue.put(_END)
+
+    producer = asyncio.ensure_future(pump())
+    watcher = asyncio.ensure_future(_until_disconnected(receive))
+    finished = False
+    try:
+        while True:
+            getter = asyncio.ensure_future(queue.get())
+            await asyncio.wait({getter, watcher}, return_when=asyncio.FIRST_COMPLETED)
+            if not getter.done():
+                getter.cancel()
+                break
+            item = getter.result()
+            if item is _END:
+                finished = True
+                break
+            if isinstance(item, _Failure):
+                finished = True
+                raise item.exc
+            yield item
+    finally:
+        watcher.cancel()
+        if not producer.done():
+            # Unwinds the pipeline, which closes any upstream stream it holds
+            producer.cancel()
+        if not finished and on_disconnect is not None:
+            on_disconnect()
+
+
+class ReadAhead:
+    """Consumes an async iterator from its own task, ahead of any reader.
+
+    Lets work such as a speculative generation start before anything is ready
+    to read it. Iterate it at most once; ``cancel`` stops the underlying
+    iterator, and so does abandoning the iteration.
+    """
+
+    def __init__(self, chunks):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.ensure_future(self._pump(chunks))
+
+    async def _pump(self, chunks):
+        try:
+            async for chunk in chunks:
+                self._queue.put_nowait(chunk)
+        except Exception as exc:
+            self._queue.put_nowait(_Failure(exc))
+        self._queue.put_nowait(_END)
+
+    def cancel(self):
+        self._task.cancel()
+
+    async def aclose(self):
+        self.cancel()
+
+    def __aiter__(self):
+        return self._drain()
+
+    async def _drain(self):
+        try:
+            while True:
+                item = await self._queue.get()
+                if item is _END:
+                    return
+                if isinstance(item, _Failure):
+                    raise item.exc
+                yield item
+        finally:
+            self.cancel()
+
+
+class GatedRelease:
+    """Releases streamed text a segment at a time, each once a check has passed.
+
+    Text is cut into segments at ``boundary`` matches, no shorter than
+    ``min_chars`` except for the last. A segment's check is called with all
+    text up to the segment's end and starts as soon as the segment is
+    complete, so checks overlap each other and the rest of the stream; the
+    segments are still released in order. ``check`` returns a falsy value to
+    release the segment. Anything else is kept in ``hold``, and that segment
+    and everything after it are held back: iteration ends once the rest of
+    the stream has been read, leaving it in ``held``.
+    """
+
+    def __init__(self, chunks, check, boundary, min_chars=0):
+        self.text = ""
+        self.released = 0
+        self.hold = None
+        self._check = check
+        self._boundary = boundary
+        self._min_chars = min_chars
+        self._cut = 0
+        self._pending = deque()
+        self._changed = asyncio.Event()
+        self._reader = asyncio.ensure_future(self._pump(chunks))
+
+    @property
+    def held(self):
+        return self.text[self.released:]
+
+    async def _pump(self, chunks):
+        try:
+            async for chunk in chunks:
+                self.text += chunk
+                for match in self._boundary.finditer(self.text, self._cut):
+                    if match.end() - self._cut >= self._min_chars:
+                        self._launch(match.end())
+            if self._cut < len(self.text):
+                self._launch(len(self.text))
+        finally:
+            self._changed.set()
+
+    def _launch(self, end):
+        if self.hold is None:
+            self._pending.append((end, asyncio.ensure_future(self._check(self.text[:end]))))
+            self._changed.set()
+        self._cut = end
+
+    def _cancel_checks(self):
+        while self._pending:
+            self._pending.popleft()[1].cancel()
+
+    def cancel(self):
+        self._reader.cancel()
+        self._cancel_checks()
+
+    async def aclose(self):
+        self.cancel()
+
+    def __aiter__(self):
+        return self._release()
+
+    async def _release(self):
+        try:
+            while self._pending or not self._reader.done():
+                if not self._pending:
+                    await self._changed.wait()
+                    self._changed.clear()
+                    continue
+                end, task = self._pending[0]
+                result = await task
+                self._pending.popleft()
+                if result:
+                    self.hold = result
+                    self._cancel_checks()
+                    break
+                segment = self.text[self.released:end]
+                self.released = end
+                yield segment
+            # Raises the stream's error, if any, once it has been read to the end
+            await self._reader
+        finally:
+            self.cancel()
@@ -0,0 +1,79 @@
+"""Structured logging that never blocks the event loop on stdout.
+
+Records are handed to a ``QueueHandler`` and written by a ``QueueListener``
+thread. Each record carries the correlation id of the request that produced
+it, and event fields are rendered as JSON (or ``key=value`` text).
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import time
+
+request_id_var = contextvars.ContextVar("request_id", default="-")
+
+
+class _RequestIdFilter(logging.Filter):
+    # Runs on the producing side, where the request's context is current
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "event": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        fields = " ".join(f"{k}={v!r}" for k, v in getattr(record, "fields", {}).items())
+        stamp = time.strftime("%H:%M:%S", time.localtime(record.created))
+        line = f"{stamp} {record.levelname:<7} [{getattr(record, 'request_id', '-')}] {record.getMessage()} {fields}".rstrip()
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+def setup_logging(name, level="INFO", fmt="json", stream=None):
+    """Configure ``name`` to log through a background writer thread."""
+    logger = logging.getLogger(name)
+    if getattr(logger, "_queue_listener", None) is not None:
+        return logger
+    records = queue.SimpleQueue()
+    handler = logging.handlers.QueueHandler(records)
+    handler.addFilter(_RequestIdFilter())
+    writer = logging.StreamHandler(stream or sys.stdout)
+    writer.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+    listener = logging.handlers.QueueListener(records, writer)
+    listener.start()
+    atexit.register(listener.stop)
+    logger.addHandler(handler)
+    logger.setLevel(level.upper())
+    logger.propagate = False
+    logger._queue_listener = listener
+    return logger
+
+
+def log_event(logger, level, event, **fields):
+    if logger.isEnabledFor(level):
+        logger.log(level, event, extra={"fields": fields})
+
+
+def sampled(rate):
+    """True for roughly ``rate`` of calls; checked before building a record."""
+    return rate >= 1 or (rate > 0 and random.random() < rate)
@@ -0,0 +1,158 @@
+"""Server-side buffers that let a /chat-stream turn outlive its connection.
+
+Each turn's pipeline runs in its own task and appends its SSE frames, tagged
+with ``id: <turn>:<seq>``, to a bounded ring buffer. Any number of responses
+can follow the buffer; a client that reconnects with ``Last-Event-ID`` is sent
+only the frames it missed and then the live ones. A turn nobody is following
+is cancelled after a grace period, so abandoned turns stop spending tokens.
+"""
+import asyncio
+import uuid
+from collections import deque
+
+
+class ReplayGap(LookupError):
+    """The frames after the requested event id are no longer buffered."""
+
+
+def parse_event_id(value):
+    """``(turn_id, seq)`` from a ``Last-Event-ID`` header, or None."""
+    turn_id, sep, seq = (value or "").strip().rpartition(":")
+    if not sep or not turn_id or not seq.lstrip("-").isdigit():
+        return None
+    return turn_id, int(seq)
+
+
+class TurnStream:
+    def __init__(self, turn_id, max_events=1024, grace_seconds=15.0, on_abandon=None, **info):
+        self.turn_id = turn_id
+        self.info = info
+        self.events = deque(maxlen=max_events)
+        self.next_seq = 0
+        self.subscribers = 0
+        self.done = False
+        self.abandoned = False
+        self.error = None
+        self.grace_seconds = grace_seconds
+        self.on_abandon = on_abandon
+        self._changed = asyncio.Event()
+        self._task = None
+        self._detach_timer = None
+
+    def start(self, frames, on_finish=None):
+        self._task = asyncio.ensure_future(self._run(frames, on_finish))
+
+    async def _run(self, frames, on_finish):
+        try:
+            async for frame in frames:
+                seq = self.next_seq
+                self.next_seq += 1
+                self.events.append((seq, f"id: {self.turn_id}:{seq}\n{frame}"))
+                self._notify()
+        except Exception as exc:
+            # Raised again to every follower once it has caught up
+            self.error = exc
+        finally:
+            self.done = True
+            self._notify()
+            if self._detach_timer is not None:
+                self._detach_timer.cancel()
+            if on_finish is not None:
+                on_finish(self)
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    @property
+    def first_seq(self):
+        return self.events[0][0] if self.events else self.next_seq
+
+    def subscribe(self, after=-1):
+        """Frames after event ``after``, then live ones until the turn ends.
+
+        Raises ReplayGap if some of the frames the caller missed have already
+        been dropped from the buffer.
+        """
+        if after + 1 < self.first_seq:
+            raise ReplayGap(f"{self.turn_id}:{after}")
+        self.subscribers += 1
+        if self._detach_timer is not None:
+            self._detach_timer.cancel()
+            self._detach_timer = None
+        return self._follow(after + 1)
+
+    async def _follow(self, seq):
+        try:
+            while True:
+                while seq < self.next_seq:
+                    first = self.first_seq
+                    if seq < first:
+                        # This follower fell further behind than the buffer holds;
+                        # ending here makes the client reconnect and learn of the gap
+                        return
+                    yield self.events[seq - first][1]
+                    seq += 1
+                if self.done:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                await self._changed.wait()
+        finally:
+            self._detach()
+
+    def _detach(self):
+        self.subscribers -= 1
+        if self.subscribers == 0 and not self.done:
+            loop = asyncio.get_running_loop()
+            self._detach_timer = loop.call_later(self.grace_seconds, self._abandon)
+
+    def _abandon(self):
+        self._detach_timer = None
+        if self.subscribers or self.done:
+            return
+        self.abandoned = True
+        self._task.cancel()
+        if self.on_abandon is not None:
+            self.on_abandon(self)
+
+
+class TurnRegistry:
+    """Live and recently finished turns, by id.
+
+    Finished turns stay available for ``ttl_seconds`` so a client that lost
+    the connection just before the end can still collect the final frames.
+    """
+
+    def __init__(self, max_events=1024, grace_seconds=15.0, ttl_seconds=120.0):
+        self.max_events = max_events
+        self.grace_seconds = grace_seconds
+        self.ttl_seconds = ttl_seconds
+        self._turns = {}
+
+    def start(self, frames, on_abandon=None, **info):
+        turn = TurnStream(
+            uuid.uuid4().hex,
+            max_events=self.max_events,
+            grace_seconds=self.grace_seconds,
+            on_abandon=on_abandon,
+            **info,
+        )
+        self._turns[turn.turn_id] = turn
+        turn.start(frames, on_finish=self._expire_later)
+        return turn
+
+    def get(self, turn_id):
+        return self._turns.get(turn_id)
+
+    def _expire_later(self, turn):
+        loop = asyncio.get_running_loop()
+        loop.call_later(self.ttl_seconds, self._turns.pop, turn.turn_id, None)
+
+    def stats(self):
+        live = sum(1 for turn in self._turns.values() if not turn.done)
+        return {
+            "turns": len(self._turns),
+            "live": live,
+            "buffered_events": sum(len(turn.events) for turn in self._turns.values()),
+        }